@@ -2,19 +2,17 @@
 
 import argparse
 import dataclasses
+import functools
+import hashlib
+import io
 import os
+import re
+import sys
 
 # == compiler globals ==
 
 version = "v0.3.0"
 
-source_file_compiled = {}
-import_paths = []
-
-output_source = ""
-defined_fn_prototypes = {}
-instaciated_fns = {}
-
 builtin_dialects = {
     "PyKarel/Kvm": [
         {
@@ -83,11 +81,6 @@ builtin_dialects = {
     ],
 }
 
-# note: filled by the correct dialect on init
-builtin_fns = {}
-builtit_reserved = set()
-builtin_cg_keywords = {}
-
 # == compiler utils ==
 
 bold_escape = "\x1b[1m"
@@ -120,19 +113,19 @@ def reset_status():
     print()
     status_print(last_status)
 
-def error_print(src_file: str, error_message: str, line_index: int, src: list):
-    print(f"\n\n{error_escape}error{reset_escape}: {error_message} at \"{src_file}\":{line_index + 1}")
+def diag_print(kind: str, kind_escape: str, src_file: str, message: str, line_index: int, src: list):
+    text = f"\n\n{kind_escape}{kind}{reset_escape}: {message} at \"{src_file}\":{line_index + 1}\n"
     
     max_digits = len(str(line_index + log_source_view_size + 1))
 
-    for i in range((-log_source_view_size), log_source_view_size + 1):
-        j = line_index + i
-        
-        if j < 0 or j > len(src) - 1:
-            continue
-        
-        print(f"{bold_escape + error_escape if i == 0 else ''}  {j + 1:0={max_digits}}:  {src[j]}{reset_escape}")
+    for j in range(max(line_index - log_source_view_size, 0), min(line_index + log_source_view_size + 1, len(src))):
+        text += f"{bold_escape + kind_escape if j == line_index else ''}  {j + 1:0={max_digits}}:  {src[j]}{reset_escape}\n"
+
+    # whole diagnostic in a single write
+    print(text, end="")
 
+def error_print(src_file: str, error_message: str, line_index: int, src: list):
+    diag_print("error", error_escape, src_file, error_message, line_index, src)
     print()
 
 def warn_print(src_file: str, warning_message: str, line_index: int, src: list):
@@ -141,28 +134,17 @@ def warn_print(src_file: str, warning_message: str, line_index: int, src: list):
     elif warning_level == 0:
         return
 
-    print(f"\n\n{warning_escape}warning{reset_escape}: {warning_message} at \"{src_file}\":{line_index + 1}")
-    
-    max_digits = len(str(line_index + log_source_view_size))
-
-    for i in range((-log_source_view_size), log_source_view_size + 1):
-        j = line_index + i
-        
-        if j < 0 or j > len(src) - 1:
-            continue
-        
-        print(f"{bold_escape + warning_escape if i == 0 else ''}  {j + 1:0={max_digits}}:  {src[j]}{reset_escape}")
-    
+    diag_print("warning", warning_escape, src_file, warning_message, line_index, src)
     reset_status()
 
 # == source asts ==
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class CallableAst:
     name: str
     comp_name: str
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class FnPrototypeAst:
     name: str
     line_of_definition: int
@@ -179,7 +161,7 @@ class FnPrototypeAst:
     src: list
     src_file: str
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class FnInstanceAst:
     name: str
     comp_name: str
@@ -187,14 +169,14 @@ class FnInstanceAst:
     owning_lambdas: list = dataclasses.field(default_factory=list)
     tracked_stack_slices: list = dataclasses.field(default_factory=list)
 
-    compiled_segments: list[str] = dataclasses.field(default_factory=list[str])
+    compiled_segments: list[str] = dataclasses.field(default_factory=list)
 
     commit_fn: CallableAst | None = None
     instance_template_args: tuple
     inherited_template_arg_values: tuple = dataclasses.field(default_factory=tuple)
     inherited_template_args: tuple = dataclasses.field(default_factory=tuple)
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class CallLocationAst:
     caller_fn_name: str
     callee_fn_name: str
@@ -210,115 +192,163 @@ class CallLocationAst:
     src_file: str
     caller_line_index: int
 
+# == compiler state ==
+
+# everything one compilation mutates, passed through the compiler instead of living in globals
+@dataclasses.dataclass(kw_only=True, slots=True)
+class CompilerState:
+    args: argparse.Namespace
+    import_paths: list
+
+    # note: filled from the dialect selected in args on init
+    builtin_fns: dict = dataclasses.field(init=False)
+    builtit_reserved: set = dataclasses.field(init=False)
+    builtin_cg_keywords: dict = dataclasses.field(init=False)
+
+    # statements compiled straight to a builtin, including the ++ and -- shorthands for place and pick
+    builtin_stmts: dict = dataclasses.field(init=False)
+    # karel-lang words a fn name must not compile to
+    builtin_output_names: frozenset = dataclasses.field(init=False)
+
+    source_file_compiled: dict = dataclasses.field(default_factory=dict)
+    real_paths: dict = dataclasses.field(default_factory=dict)
+
+    output_source: io.TextIOBase = dataclasses.field(default_factory=io.StringIO)
+    defined_fn_prototypes: dict = dataclasses.field(default_factory=dict)
+    instaciated_fns: dict = dataclasses.field(default_factory=dict)
+
+    def __post_init__(self):
+        self.builtin_fns, self.builtit_reserved, self.builtin_cg_keywords = builtin_dialects[self.args.lkarel_lang_dialect]
+
+        self.builtin_stmts = {**self.builtin_fns, "++": self.builtin_fns['place'], "--": self.builtin_fns['pick']}
+        self.builtin_output_names = frozenset((*self.builtin_fns.values(), *self.builtin_cg_keywords.values()))
+
 # == compiler ==
 
-def parse_template_args(src: list, src_file: str, src_line: int, call_exp: str, args: argparse.Namespace) -> tuple[tuple, int]:
-    # find template args clousure begining
-    i = 0
+# characters the fn body scanner stops at, text in between is sliced out whole
+scan_delimiter_re = re.compile(r'[\n{};\[]')
+scan_whitespace_re = re.compile(r'\s+')
+scan_brace_re = re.compile(r'[{}]')
 
-    while i < len(call_exp):
-        c = call_exp[i]
+# keywords starting a ';' terminated statement, matched as whole words so fn names like "format" or "recaller" are not taken for keywords
+statement_keyword_re = re.compile(r'(no_op|recall|commit|if|while|for)\b')
+top_level_keyword_re = re.compile(r'(import|fn)\s')
 
-        if c == ')':
-            raise CompileError("syntax error - unexpected \')\' before \'(\' in a call expression", src_file, src_line, src)
+# characters that open, close or separate template args
+template_delimiter_re = re.compile(r'[(),]')
 
-        if c == '(':
-            break
+@functools.lru_cache(maxsize=None)
+def template_target_re(template_args: tuple) -> re.Pattern:
+    # matches any "[arg]" template target of the given template args in one pass
+    return re.compile(r'\[(' + '|'.join(re.escape(arg) for arg in template_args) + r')\]')
 
-        i += 1
+# parses template args of a call expression, returns an error message instead of raising so results can be cached
+@functools.lru_cache(maxsize=None)
+def parse_template_args_exp(call_exp: str) -> tuple[tuple, int] | str:
+    # find template args clousure begining
+    i = call_exp.find('(')
 
-    if i == len(call_exp):
+    if call_exp.find(')', 0, len(call_exp) if i == -1 else i) != -1:
+        return "syntax error - unexpected \')\' before \'(\' in a call expression"
+
+    if i == -1:
         # no templates args used
         return (tuple(), 0)
     
     # find template args clousure end
     i += 1
-    j = i
+    j = -1
 
+    # args are stripped and checked as they are found, the first empty one is reported once the clousure is closed
     template_args = []
+    missing_arg_pos = 0
     clousure_depth = 1
 
-    while j < len(call_exp):
-        c = call_exp[j]
+    for m in template_delimiter_re.finditer(call_exp, i):
+        c = m.group()
 
         if c == '(':
             clousure_depth += 1
             
-            # raise CompileError("syntax error - unexpected \'(\' after template expression", src_file, src_line, src)
+            # return "syntax error - unexpected \'(\' after template expression"
 
         elif c == ')':
             clousure_depth -= 1
 
             if clousure_depth == 0:
-                template_args.append(call_exp[i:j])
-                i = j + 1
+                j = m.start()
+                arg = call_exp[i:j].strip()
+
+                if arg == '':
+                    if len(template_args) == 0:
+                        # alternate syntax for no template args
+                        return (tuple(), j)
+
+                    if missing_arg_pos == 0:
+                        missing_arg_pos = len(template_args) + 1
+
+                # interned as they end up in instance keys and comp names
+                template_args.append(sys.intern(arg))
 
                 break
         
-        elif c == ',' and clousure_depth == 1:
-            template_args.append(call_exp[i:j])
-            i = j + 1
+        elif clousure_depth == 1:
+            arg = call_exp[i:m.start()].strip()
+
+            if arg == '' and missing_arg_pos == 0:
+                missing_arg_pos = len(template_args) + 1
 
-        j += 1
+            template_args.append(sys.intern(arg))
+            i = m.end()
     
-    if j == len(call_exp):
-        raise CompileError("unexpected end of file - template args expression never closed", src_file, src_line, src)
+    if j == -1:
+        return "unexpected end of file - template args expression never closed"
 
-    # cleanup template args
+    if missing_arg_pos != 0:
+        return f"syntax error - missing template argument at position {missing_arg_pos}"
 
-    for i in range(len(template_args)):
-        template_args[i] = template_args[i].strip()
+    return (tuple(template_args), j)
 
-    if len(template_args) == 1 and template_args[0].strip() == '':
-        # alternate syntax for no template args
-        return (tuple(), j)
+def parse_template_args(src: list, src_file: str, src_line: int, call_exp: str) -> tuple[tuple, int]:
+    parsed = parse_template_args_exp(call_exp)
 
-    for i, arg in enumerate(template_args):
-        arg = arg.strip()
+    if isinstance(parsed, str):
+        raise CompileError(parsed, src_file, src_line, src)
 
-        if arg == '':
-            raise CompileError(f"syntax error - missing template argument at position {i + 1}", src_file, src_line, src)
+    return parsed
 
-    return (tuple(template_args), j)
+# conditions following an "is_" or "not_" prefix, named as their builtin_cg_keywords entries
+condition_names = frozenset(("wall", "flag", "home", "north", "south", "east", "west"))
 
-def parse_contition(src: list, src_file: str, src_line: int, cond_exp: str, args: argparse.Namespace) -> tuple[str, int]:
+def parse_contition(src: list, src_file: str, src_line: int, cond_exp: str, state: CompilerState) -> tuple[str, int]:
     size_read = 0
     orig_cond_exp = cond_exp
     
     if cond_exp.startswith("is_"):
         cond_exp = cond_exp[3:]
         size_read += 3
-        invert_prefix = f"{builtin_cg_keywords['is']} "
+        invert_prefix = f"{state.builtin_cg_keywords['is']} "
     elif cond_exp.startswith("not_"):
         cond_exp = cond_exp[4:]
         size_read += 4
-        invert_prefix = f"{builtin_cg_keywords['not']} "
+        invert_prefix = f"{state.builtin_cg_keywords['not']} "
     else:
         raise CompileError("syntax error - condition must start with 'is_' or 'not_'", src_file, src_line, src)
 
-    if cond_exp.startswith("wall "):
-        return (invert_prefix + f"{builtin_cg_keywords['wall']}", 5 + size_read)
-    elif cond_exp.startswith("flag "):
-        return (invert_prefix + f"{builtin_cg_keywords['flag']}", 5 + size_read)
-    elif cond_exp.startswith("home "):
-        return (invert_prefix + f"{builtin_cg_keywords['home']}", 5 + size_read)
-    elif cond_exp.startswith("north "):
-        return (invert_prefix + f"{builtin_cg_keywords['north']}", 6 + size_read)
-    elif cond_exp.startswith("south "):
-        return (invert_prefix + f"{builtin_cg_keywords['south']}", 6 + size_read)
-    elif cond_exp.startswith("east "):
-        return (invert_prefix + f"{builtin_cg_keywords['east']}", 5 + size_read)
-    elif cond_exp.startswith("west "):
-        return (invert_prefix + f"{builtin_cg_keywords['west']}", 5 + size_read)
+    # condition name must be followed by a space
+    cond_name, separator, _ = cond_exp.partition(' ')
+
+    if separator != '' and cond_name in condition_names:
+        return (invert_prefix + state.builtin_cg_keywords[cond_name], len(cond_name) + 1 + size_read)
     else:
         raise CompileError(f"syntax error - unknown condition \"{orig_cond_exp.strip()}\"", src_file, src_line, src)
 
-def parse_fn(src: list, src_file: str, define_line_index: int, lambda_owner: FnInstanceAst | None, args: argparse.Namespace) -> FnPrototypeAst:
-    tem_args, tem_end = parse_template_args(src, src_file, define_line_index, src[define_line_index], args)
+def parse_fn(src: list, src_file: str, define_line_index: int, lambda_owner: FnInstanceAst | None, state: CompilerState) -> FnPrototypeAst:
+    tem_args, tem_end = parse_template_args(src, src_file, define_line_index, src[define_line_index])
     
     is_slice = False
     if lambda_owner == None:
-        fn_name = src[define_line_index].split('//', 1)[0].strip()[3:].rstrip("{").strip()
+        fn_name = src[define_line_index].partition('//')[0].strip()[3:].removesuffix("{").strip()
 
         if fn_name.endswith(" slicing"):
             is_slice = True
@@ -328,36 +358,46 @@ def parse_fn(src: list, src_file: str, define_line_index: int, lambda_owner: FnI
 
         if ' ' in fn_name:
             raise CompileError("syntax error - fn name cannot contain spaces", src_file, define_line_index, src)
-        elif fn_name in builtit_reserved or fn_name.upper() in builtin_fns.values() or fn_name.upper() in builtin_cg_keywords.values():
+        elif fn_name in state.builtit_reserved or fn_name.upper() in state.builtin_output_names:
             raise CompileError(f"\"{fn_name}\" is a reserved keyword by karel-lang", src_file, define_line_index, src)
     else:
         fn_name = f"{lambda_owner.name}_lambda_n{len(lambda_owner.owning_lambdas)}"
-        is_slice = not lambda_owner.commit_fn == None # parent is commiting -> is a slice valid fn
+        is_slice = lambda_owner.commit_fn != None # parent is commiting -> is a slice valid fn
 
-    # find end of fn
+    # find end of fn, stripping the fn source for compile stage on the way
     
     end_line = -1
     clousure_depth = 0
+    fn_src = []
+
+    for i in range(define_line_index, len(src)):
+        # strip comments
+        line = src[i].partition('//')[0].strip()
+        fn_src.append(line + '\n')
+
+        # a line without '}' cannot close the fn, only count its openings
+        if '}' not in line:
+            clousure_depth += line.count('{')
+            continue
 
-    for i, line in enumerate(src[define_line_index:]):
-        for j, char in enumerate(line):
-            if char == '{':
+        for m in scan_brace_re.finditer(line):
+            if m.group() == '{':
                 clousure_depth += 1
 
-            elif char == '}':
+            else:
                 clousure_depth -= 1
                 
                 if clousure_depth == 0:
-                    end_line = i + define_line_index
+                    end_line = i
 
-                    if not j + 1 == len(line.split('//', 1)[0].strip()) and lambda_owner == None:
-                        raise CompileError("syntax error - expected a new line after fn final \'}\'", src_file, i + define_line_index, src) 
+                    if m.end() != len(line) and lambda_owner == None:
+                        raise CompileError("syntax error - expected a new line after fn final \'}\'", src_file, i, src) 
 
                     break
                 elif clousure_depth < 0:
-                    raise CompileError("syntax error - unexpected '}' before any '{'", src_file, i + define_line_index, src)
+                    raise CompileError("syntax error - unexpected '}' before any '{'", src_file, i, src)
         
-        if not end_line == -1:
+        if end_line != -1:
             break
     
     if end_line == -1:
@@ -365,21 +405,12 @@ def parse_fn(src: list, src_file: str, define_line_index: int, lambda_owner: FnI
 
     # create fn ast
 
-    if fn_name in defined_fn_prototypes:
-        raise CompileError(f"redefinition of fn \"{fn_name}\" first defined at \"{defined_fn_prototypes[fn_name].src_file}\":{defined_fn_prototypes[fn_name].line_of_definition + 1}", src_file, define_line_index, src)
-
-    # strip fn source for compile stage
-
-    fn_src = src[define_line_index:end_line + 1]
-    for i in range(len(fn_src)):
-        l = fn_src[i]
-
-        # strip comments
-        l = l.split('//', 1)[0]
-
-        l = l.strip()
+    # interned so every call location refering to this fn shares the one name string
+    fn_name = sys.intern(fn_name)
 
-        fn_src[i] = l + '\n'
+    prev_fn = state.defined_fn_prototypes.get(fn_name)
+    if prev_fn is not None:
+        raise CompileError(f"redefinition of fn \"{fn_name}\" first defined at \"{prev_fn.src_file}\":{prev_fn.line_of_definition + 1}", src_file, define_line_index, src)
 
     # test for top-level implicit usage
 
@@ -387,7 +418,7 @@ def parse_fn(src: list, src_file: str, define_line_index: int, lambda_owner: FnI
     implicit_usage = True
 
     # must not use templates to be implicitly used
-    if not len(tem_args) == 0:
+    if len(tem_args) != 0:
         implicit_usage = False
 
     # must not be a slicing fn to be implicitly used
@@ -396,22 +427,59 @@ def parse_fn(src: list, src_file: str, define_line_index: int, lambda_owner: FnI
 
     # lambdas can contain inherited template args which we cannot check here
     # lambdas are always used "explicitly" anyway
-    elif not lambda_owner == None:
+    elif lambda_owner != None:
         implicit_usage = False
 
     fn = FnPrototypeAst(name=fn_name, fn_src=inline_fn_src, src=src, src_file=src_file, ending_line_of_definition=end_line, line_of_definition=define_line_index, template_args=tem_args, top_level_implicit_usage=implicit_usage, is_slice_valid=is_slice)
-    defined_fn_prototypes[fn_name] = fn
+    state.defined_fn_prototypes[fn_name] = fn
 
     return fn
 
-def gen_comp_name(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, seg_index: int) -> str:
-    if not args.g:
-        return fn_proto.name + ('' if seg_index == 0 else f"_seg{seg_index}") + f"<ch{hash(call_loc.callee_commit_dest_fn.comp_name) if not call_loc.callee_commit_dest_fn is None else '-none'}-th{hash(call_loc.template_arg_values + call_loc.inherited_template_arg_values) if len(call_loc.template_arg_values) + len(call_loc.inherited_template_arg_values) else '-none'}>"
+# stable across runs unlike hash(), which is salted per process for strings
+@functools.lru_cache(maxsize=None)
+def stable_hash(value: str | tuple) -> str:
+    return hashlib.blake2b(repr(value).encode(), digest_size=8).hexdigest()
+
+# comp names are interned, they are compared and hashed as commit destinations in instance keys
+def gen_comp_name(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, seg_index: int, state: CompilerState) -> str:
+    if not state.args.g:
+        comp_name = fn_proto.name + ('' if seg_index == 0 else f"_seg{seg_index}") + f"<ch{stable_hash(call_loc.callee_commit_dest_fn.comp_name) if call_loc.callee_commit_dest_fn is not None else '-none'}-th{stable_hash(call_loc.template_arg_values + call_loc.inherited_template_arg_values) if len(call_loc.template_arg_values) + len(call_loc.inherited_template_arg_values) else '-none'}>"
     else:
-        return fn_proto.name + ('' if seg_index == 0 else f"_seg{seg_index}") + f"<commit-loc={call_loc.callee_commit_dest_fn.comp_name if not call_loc.callee_commit_dest_fn is None else 'none'}|template-args={call_loc.template_arg_values}{f'+inherited={call_loc.inherited_template_arg_values}' if len(call_loc.inherited_template_arg_values) > 0 else ''}>".replace(' ', '')
+        comp_name = fn_proto.name + ('' if seg_index == 0 else f"_seg{seg_index}") + f"<commit-loc={call_loc.callee_commit_dest_fn.comp_name if call_loc.callee_commit_dest_fn is not None else 'none'}|template-args={call_loc.template_arg_values}{f'+inherited={call_loc.inherited_template_arg_values}' if len(call_loc.inherited_template_arg_values) > 0 else ''}>".replace(' ', '')
+
+    return sys.intern(comp_name)
+
+# key of a fn instance in CompilerState.instaciated_fns
+def fn_instance_key(fn_proto: FnPrototypeAst, template_arg_values: tuple, inherited_template_arg_values: tuple, commit_dest_fn: CallableAst | None) -> str | tuple:
+    if fn_proto.top_level_implicit_usage:
+        # fns with implicit usage are by definition the only fn with that name
+        return fn_proto.name
+
+    # keyed by the values themselves, not the comp name, whose hashes could collide
+    return (fn_proto.name, None if commit_dest_fn is None else commit_dest_fn.comp_name, template_arg_values, inherited_template_arg_values)
 
 # returns a precompiled FnInstanceAst if it has already been compiled with the same template args and commit fn 
-def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argparse.Namespace) -> FnInstanceAst:
+def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, state: CompilerState) -> FnInstanceAst:
+    # nested fn compilations are driven from an explicit stack instead of recursing
+    # so deep call chains are not bound by the python recursion limit
+    compile_stack = [compile_fn_steps(fn_proto, call_loc, state)]
+    result = None
+
+    while len(compile_stack) > 0:
+        try:
+            callee_proto, callee_call_loc = compile_stack[-1].send(result)
+        except StopIteration as e:
+            compile_stack.pop()
+            result = e.value
+            continue
+
+        compile_stack.append(compile_fn_steps(callee_proto, callee_call_loc, state))
+        result = None
+
+    return result
+
+# compiles a fn instance, yields (fn proto, call location) for every fn it needs compiled and gets its FnInstanceAst sent back
+def compile_fn_steps(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, state: CompilerState):
     i = 0
     line_index = fn_proto.line_of_definition
 
@@ -422,25 +490,34 @@ def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argpar
 
     # create fn instance ast
 
-    comp_name = gen_comp_name(fn_proto, call_loc, 0)
+    instance_key = fn_instance_key(fn_proto, call_loc.template_arg_values, call_loc.inherited_template_arg_values, call_loc.callee_commit_dest_fn)
+
+    # return FnInstanceAst if already compiled an instance with the same template set and commit fn
+    fn = state.instaciated_fns.get(instance_key)
+    if fn is not None:
+        return fn
 
     if fn_proto.top_level_implicit_usage:
         # fns with implicit usage are by definition the only fn with that name
         # no extra strings are required to avoid name collisions
 
         comp_name = fn_proto.name
+    elif call_loc.callee_commit_dest_fn is None and len(call_loc.template_arg_values) == 0 and len(call_loc.inherited_template_arg_values) == 0:
+        # without template args or a commit fn there can only be one instance of the fn, keep its plain name
 
-    # return FnInstanceAst if already compiled an instance with the same template set and commit fn
-    if comp_name in instaciated_fns:
-        return instaciated_fns[comp_name]
+        comp_name = fn_proto.name
+    else:
+        comp_name = gen_comp_name(fn_proto, call_loc, 0, state)
 
     fn = FnInstanceAst(name=fn_proto.name, comp_name=comp_name, commit_fn=call_loc.callee_commit_dest_fn, instance_template_args=call_loc.template_arg_values, inherited_template_arg_values=call_loc.inherited_template_arg_values, inherited_template_args=call_loc.inherited_template_args)
-    instaciated_fns[comp_name] = fn
+    state.instaciated_fns[instance_key] = fn
 
     # define function in output source
 
-    current_comp_segment = ""
+    # lines of the segment being compiled, joined once the segment is stored
+    current_comp_segment = []
     current_comp_segment_depth = 1
+    indent = '   ' # indentation of current_comp_segment_depth, updated along with it
 
     current_comp_segment_index = 0
     next_comp_segment_index = 0
@@ -450,209 +527,218 @@ def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argpar
     block_clousure_depth = 1
 
     # slice order tracking
-    slice_stack_scopes = []
-    poped_stack_slices = []
+    slice_stack_scopes = [] # last pushed slice at the end
+    poped_stack_slices = set()
 
     # used for validating else statements
     is_last_end_if = {}
 
-    current_comp_segment = ''.join((current_comp_segment, fn.comp_name, '\n'))
+    current_comp_segment.append(f"{fn.comp_name}\n")
 
     # instantiate template args
 
-    if not len(fn_proto.template_args) == len(call_loc.template_arg_values):
+    if len(fn_proto.template_args) != len(call_loc.template_arg_values):
         raise CompileError(f"incorrect number of template args for fn \"{fn_proto.name}\", expected {len(fn_proto.template_args)}, got {len(call_loc.template_arg_values)}", call_loc.src_file, call_loc.caller_line_index, call_loc.src)
 
     to_replace = fn_proto.template_args + call_loc.inherited_template_args
     to_insert = call_loc.template_arg_values + call_loc.inherited_template_arg_values
 
     fn_src = fn_proto.fn_src
-    for i, arg in enumerate(to_replace):
-        fn_src = fn_src.replace('[' + arg + ']', to_insert[i])
+
+    if len(to_replace) != 0:
+        # own template args shadow inherited ones with the same name
+        template_values = {}
+        for arg, value in zip(to_replace, to_insert):
+            template_values.setdefault(arg, value)
+
+        fn_src = template_target_re(to_replace).sub(lambda m: template_values[m.group(1)], fn_src)
 
     # parse and compile fn segments
 
-    while fn_src[i] != '{':
-        i += 1
-    i += 1
+    fn_src_len = len(fn_src)
+    i = fn_src.index('{') + 1
+
+    # bound once, used for every delimiter of the fn body
+    delimiter_search = scan_delimiter_re.search
+    whitespace_sub = scan_whitespace_re.sub
+    keyword_match_at = statement_keyword_re.match
+    get_fn_proto = state.defined_fn_prototypes.get
+    get_fn_instance = state.instaciated_fns.get
+    get_builtin_stmt = state.builtin_stmts.get
+
+    # codegen keywords of the dialect, fixed for the whole compilation
+    kw_if = state.builtin_cg_keywords['if']
+    kw_else = state.builtin_cg_keywords['else']
+    kw_end = state.builtin_cg_keywords['end']
+    kw_while = state.builtin_cg_keywords['while']
+    kw_for = state.builtin_cg_keywords['for']
+    kw_for_suffix = state.builtin_cg_keywords['for-suffix']
 
     acc = ""
 
-    while i < len(fn_src):
+    while i < fn_src_len:
+        # jump to the next delimiter and take the text before it at once
+        m = delimiter_search(fn_src, i)
+
+        if m is None:
+            i = fn_src_len
+            break
+
+        acc += fn_src[i:m.start()]
+        i = m.start()
         c = fn_src[i]
 
         if c == '\n':
             line_index += 1
+            acc += ' '
 
-            if not len(acc) == 0 and not acc[-1] == ' ':
-                acc += ' '
-            
-            i += 1
-            continue
-        elif c.strip() == '':
-            if not len(acc) == 0 and not acc[-1] == ' ':
-                acc += ' '
-            
             i += 1
             continue
         elif c == '[':
             warn_print(fn_proto.src_file, f"unresolved template target in fn \"{fn_proto.name}\" called by fn \"{call_loc.caller_fn_name}\" (did you forget to define it in template args?)", line_index, fn_proto.src)
 
-            start_line_index = line_index
-            while i < len(fn_src):
-                c = fn_src[i]
+            target_end = fn_src.find(']', i)
 
-                if c == '\n':
-                    line_index += 1
-                elif c == ']':
-                    break
-
-                i += 1
+            if target_end == -1:
+                raise CompileError("syntax error - unresolved template target never closed, expected \']\'", fn_proto.src_file, line_index, fn_proto.src)
 
-            if not c == ']':
-                raise CompileError("syntax error - unresolved template target never closed, expected \']\'", fn_proto.src_file, start_line_index, fn_proto.src)
+            line_index += fn_src.count('\n', i, target_end)
+            i = target_end
 
         elif c == '{':
             # parse block
 
             block_clousure_depth += 1
+            acc = whitespace_sub(' ', acc).lstrip()
+
+            # whitespace is collapsed, the block keyword is everything before the first space
+            block_keyword, _, block_rest = acc.partition(' ')
 
             if '=' in acc:
                 # TODO: slice assigment
                 pass
-            elif acc.startswith("if "):
-                acc = acc[3:]
+            elif block_keyword == "if":
+                acc = block_rest
 
-                cond = parse_contition(fn_proto.src, fn_proto.src_file, line_index, acc, args)
+                cond = parse_contition(fn_proto.src, fn_proto.src_file, line_index, acc, state)
                 acc = acc[cond[1]:]
 
-                if not acc.strip() == '':
+                if acc.strip() != '':
                     raise CompileError("syntax error - expected a \'{\' after an if statement", fn_proto.src_file, line_index, fn_proto.src)
 
-                current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, f"{builtin_cg_keywords['if']} {cond[0]}\n"))
+                current_comp_segment.append(f"{indent}{kw_if} {cond[0]}\n")
                 is_last_end_if[current_comp_segment_depth] = True
                 current_comp_segment_depth += 1
+                indent = '   ' * current_comp_segment_depth
 
-            elif acc.startswith("else"): # note: no suffixed space because else keyword doesn't have a condition
-                acc = acc[4:]
+            elif block_keyword == "else":
+                acc = block_rest
 
                 # check that the last output line is an end of an if block
-                if not current_comp_segment_depth in is_last_end_if or not is_last_end_if[current_comp_segment_depth] or (not len(current_comp_segment) > len(builtin_cg_keywords['end']) + 1 or not current_comp_segment[-(len(builtin_cg_keywords['end']) + 1):] == f"{builtin_cg_keywords['end']}\n"):
+                if not is_last_end_if.get(current_comp_segment_depth, False) or current_comp_segment[-1] != f"{indent}{kw_end}\n":
                     raise CompileError("syntax error - else statements can be only defined after an if", fn_proto.src_file, line_index, fn_proto.src)
 
-                if not acc.strip() == '':
+                if acc.strip() != '':
                     raise CompileError("syntax error - expected a \'{\' after an else statement", fn_proto.src_file, line_index, fn_proto.src)
 
                 # remove last 'END\n' and reopen the (empty) else block
-                current_comp_segment = current_comp_segment[:-(len(builtin_cg_keywords['end']) + 1) - len('   ' * current_comp_segment_depth)]
+                current_comp_segment.pop()
                 is_last_end_if[current_comp_segment_depth] = False
                 current_comp_segment_depth += 1
+                indent = '   ' * current_comp_segment_depth
 
-            elif acc.startswith("while "):
-                acc = acc[6:]
+            elif block_keyword == "while":
+                acc = block_rest
 
-                cond = parse_contition(fn_proto.src, fn_proto.src_file, line_index, acc, args)
+                cond = parse_contition(fn_proto.src, fn_proto.src_file, line_index, acc, state)
                 acc = acc[cond[1]:]
 
-                if not acc.strip() == '':
+                if acc.strip() != '':
                     raise CompileError("syntax error - expected a \'{\' after a while statement", fn_proto.src_file, line_index, fn_proto.src)
 
-                current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, f"{builtin_cg_keywords['while']} {cond[0]}\n"))
+                current_comp_segment.append(f"{indent}{kw_while} {cond[0]}\n")
                 is_last_end_if[current_comp_segment_depth] = False
                 current_comp_segment_depth += 1
+                indent = '   ' * current_comp_segment_depth
 
-            elif acc.startswith("for "):
-                acc = acc[4:]
+            elif block_keyword == "for":
+                acc = block_rest
 
                 try:
+                    # the count is converted as a whole so any prefix int() accepts for base 0 (0x, 0o, 0b) is allowed
                     count = int(acc, base=0)
-                    acc = acc[len(str(count)):]
                 except ValueError:
                     raise CompileError(f"for loop count \"{acc.strip()}\" is not convertible to an integer", fn_proto.src_file, line_index, fn_proto.src)
 
-                if not acc.strip() == '':
-                    raise CompileError("syntax error - expected a \'{\' after a for statement", fn_proto.src_file, line_index, fn_proto.src)
-
-                if count > args.max_loop_count:
-                    warn_print(fn_proto.src_file, f"for loop count {count} is greater than the safe maximum of {args.max_loop_count}", line_index, fn_proto.src)
+                if count > state.args.max_loop_count:
+                    warn_print(fn_proto.src_file, f"for loop count {count} is greater than the safe maximum of {state.args.max_loop_count}", line_index, fn_proto.src)
 
-                current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, f"{builtin_cg_keywords['for']} {count}{builtin_cg_keywords['for-suffix']}\n"))
+                current_comp_segment.append(f"{indent}{kw_for} {count}{kw_for_suffix}\n")
                 is_last_end_if[current_comp_segment_depth] = False
                 current_comp_segment_depth += 1
+                indent = '   ' * current_comp_segment_depth
 
-            elif acc.startswith("fn "):
+            elif block_keyword == "fn":
                 raise CompileError("syntax error - fn definitions are not allowed inside fn bodies (did you forget a \'}\'?)", fn_proto.src_file, line_index, fn_proto.src)
             else:
                 # parse lambda for this fn instance
 
                 fn_name = f"{fn.name}_lambda_n{len(fn.owning_lambdas)}"
 
-                if fn_name in defined_fn_prototypes:
-                    lambda_proto =  defined_fn_prototypes[fn_name] 
-                else:
-                    lambda_proto = parse_fn(fn_proto.src, fn_proto.src_file, line_index, fn, args)
+                lambda_proto = get_fn_proto(fn_name)
+                if lambda_proto is None:
+                    lambda_proto = parse_fn(fn_proto.src, fn_proto.src_file, line_index, fn, state)
 
                 # offset to lambdas end
 
+                lambda_start = i
                 clousure_depth = 0
-                while i < len(fn_src):
-                    char = fn_src[i]
-                    
-                    if char == '\n':
-                        line_index += 1
-
-                    if char == '{':
+                for m in scan_brace_re.finditer(fn_src, i):
+                    if m.group() == '{':
                         clousure_depth += 1
-
-                    elif char == '}':
+                    else:
                         clousure_depth -= 1
 
                         if clousure_depth == 0:
+                            i = m.start()
                             break
-                    
-                    i += 1
+                else:
+                    i = fn_src_len
+
+                line_index += fn_src.count('\n', lambda_start, i)
                 i += 1
 
                 # parse out the template instanciation args
 
-                l_acc = ''
+                # the tail between the lambda body and the next ';' may only hold template args
+                tail_end = fn_src.find(';', i)
+                if tail_end == -1:
+                    tail_end = fn_src_len
 
-                while i < len(fn_src):
-                    c = fn_src[i]
+                l_acc = fn_src[i:tail_end]
+                tail_start = len(l_acc) - len(l_acc.lstrip())
 
-                    if c == '\n':
-                        line_index += 1
-                        l_acc += ' '
+                if tail_start != len(l_acc) and l_acc[tail_start] != '(':
+                    raise CompileError("syntax error - expected a \';\' after a lambda definition", fn_proto.src_file, line_index + l_acc.count('\n', 0, tail_start), fn_proto.src)
 
-                        if not len(l_acc) == 0 and not l_acc[-1] == ' ':
-                            l_acc += ' '
-                    elif c.strip() == '':
-                        if not len(l_acc) == 0 and not l_acc[-1] == ' ':
-                            l_acc += ' '
-                    elif c == ';':
-                        if '(' in l_acc and not ')' in l_acc:
-                            raise CompileError("syntax error - unexpected \';\' inside a template args closure", fn_proto.src_file, line_index, fn_proto.src)
+                line_index += l_acc.count('\n')
+                i = tail_end
+                l_acc = whitespace_sub(' ', l_acc).strip()
 
-                        break
-                    else:
-                        if not '(' in l_acc and not c == '(':
-                            raise CompileError("syntax error - expected a \';\' after a lambda definition", fn_proto.src_file, line_index, fn_proto.src)
-
-                        l_acc += c
-                    
-                    i += 1
+                if tail_end != fn_src_len and '(' in l_acc and ')' not in l_acc:
+                    raise CompileError("syntax error - unexpected \';\' inside a template args closure", fn_proto.src_file, line_index, fn_proto.src)
 
                 # compile lambda fn instance
-                tem_args, read_size = parse_template_args(fn_proto.src, fn_proto.src_file, line_index, l_acc, args)
+                tem_args, read_size = parse_template_args(fn_proto.src, fn_proto.src_file, line_index, l_acc)
 
-                if not read_size == 0:
+                if read_size != 0:
                     l_acc = l_acc[read_size + 1:]
                 else:
                     l_acc = l_acc[1:]
                 
                 l_acc = l_acc.strip()
 
-                if not l_acc == '':
+                if l_acc != '':
                     raise CompileError("syntax error - expected a \';\' after a lambda definition", fn_proto.src_file, line_index, fn_proto.src)
 
                 lambda_call_loc = CallLocationAst(
@@ -668,10 +754,10 @@ def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argpar
                 )
 
                 # note: includes callers templates in the template hash, as parents template args can affect a child lambda
-                lambda_fn_instance = compile_fn(lambda_proto, lambda_call_loc, args)
+                lambda_fn_instance = yield (lambda_proto, lambda_call_loc)
 
                 # call lambda
-                current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, f"{lambda_fn_instance.comp_name}\n"))
+                current_comp_segment.append(f"{indent}{lambda_fn_instance.comp_name}\n")
 
                 fn.owning_lambdas.append(lambda_fn_instance)
                 block_clousure_depth -= 1
@@ -679,56 +765,60 @@ def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argpar
             acc = ""
         
         elif c == '}':
-            if not acc.strip() == '':
+            if acc.strip() != '':
                 raise CompileError("syntax error - unexpected expression before '}' (did you forget a ';'?)", fn_proto.src_file, line_index, fn_proto.src)
 
             # end block
             acc = ""
 
             current_comp_segment_depth -= 1
+            indent = '   ' * current_comp_segment_depth
             
-            if not current_comp_segment_depth in is_last_end_if or not is_last_end_if[current_comp_segment_depth]:
-                current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, f"{builtin_cg_keywords['end']}\n"))
-            else:
-                current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, f"{builtin_cg_keywords['else']}\n", '   ' * current_comp_segment_depth, f"{builtin_cg_keywords['end']}\n"))
+            if is_last_end_if.get(current_comp_segment_depth, False):
+                current_comp_segment.append(f"{indent}{kw_else}\n")
+
+            current_comp_segment.append(f"{indent}{kw_end}\n")
 
             block_clousure_depth -= 1
             if block_clousure_depth == 0:
                 # ending fn instance
 
-                if not len(slice_stack_scopes) == 0:
-                    raise CompileError(f"stack slice(s) {slice_stack_scopes} were not poped before ending scope! No tracked slices must exist at the end of a scope", fn_proto.src_file, line_index, fn_proto.src) 
+                if len(slice_stack_scopes) != 0:
+                    raise CompileError(f"stack slice(s) {slice_stack_scopes[::-1]} were not poped before ending scope! No tracked slices must exist at the end of a scope", fn_proto.src_file, line_index, fn_proto.src) 
+
+                current_comp_segment.append('\n')
 
                 if len(fn.compiled_segments) > current_comp_segment_index:
-                    fn.compiled_segments[current_comp_segment_index] = ''.join((current_comp_segment, '\n'))
+                    fn.compiled_segments[current_comp_segment_index] = ''.join(current_comp_segment)
                 else:
-                    fn.compiled_segments.append(''.join((current_comp_segment, '\n')))
+                    fn.compiled_segments.append(''.join(current_comp_segment))
 
                 break
 
         elif c == ';':
             # parse expression
 
-            acc = acc.strip()
+            acc = whitespace_sub(' ', acc).strip()
+
+            keyword_match = keyword_match_at(acc)
+            keyword = None if keyword_match is None else keyword_match.group(1)
+
+            builtin_stmt = get_builtin_stmt(acc)
 
-            if acc == "++":
-                current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, f"{builtin_fns['place']}\n"))
-            elif acc == "--":
-                current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, f"{builtin_fns['pick']}\n"))
+            if builtin_stmt is not None:
+                current_comp_segment.append(f"{indent}{builtin_stmt}\n")
             elif acc == "":
                 pass
-            elif acc in builtin_fns:
-                current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, f"{builtin_fns[acc]}\n"))
-            elif acc.startswith("no_op"):
-                if not acc.strip() == "no_op":
+            elif keyword == "no_op":
+                if acc.strip() != "no_op":
                     raise CompileError(f"syntax error - expected a ';' after a no_op keyword", fn_proto.src_file, line_index, fn_proto.src)
 
                 pass # no_op does a no-op
-            elif acc.startswith("recall"):
+            elif keyword == "recall":
                 # if '(' in acc and not ')' in acc:
                 #     raise CompileError("syntax error - unexpected \';\' inside a template args closure", fn_proto.src_file, line_index, fn_proto.src)
 
-                tem_args, size_read = parse_template_args(fn_proto.src, fn_proto.src_file, line_index, acc, args)
+                tem_args, size_read = parse_template_args(fn_proto.src, fn_proto.src_file, line_index, acc)
                 
                 if size_read == 0:
                     acc = acc[6:]
@@ -737,41 +827,45 @@ def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argpar
 
                 acc = acc.strip()
 
-                if not acc == '':
+                if acc != '':
                         raise CompileError(f"syntax error - expected a ';' after a recall keyword", fn_proto.src_file, line_index, fn_proto.src)
 
-                # recompile fn with possibly new template args
-                recall_loc = CallLocationAst(
-                    caller_fn_name=fn_proto.name, 
-                    callee_fn_name=fn_proto.name,
-                    template_arg_values=call_loc.template_arg_values if len(tem_args) == 0 else tem_args,
-                    inherited_template_arg_values=fn.inherited_template_arg_values,
-                    inherited_template_args=fn.inherited_template_args,
-                    callee_commit_dest_fn=call_loc.callee_commit_dest_fn,
-                    src=fn_proto.src,
-                    src_file=fn_proto.src_file,
-                    caller_line_index=line_index
-                )
+                if len(tem_args) == 0 or tem_args == call_loc.template_arg_values:
+                    # same template args, inherited args and commit fn, the recall targets this very instance
+                    recall_fn_instance = fn
+                else:
+                    # recompile fn with new template args
+                    recall_loc = CallLocationAst(
+                        caller_fn_name=fn_proto.name, 
+                        callee_fn_name=fn_proto.name,
+                        template_arg_values=tem_args,
+                        inherited_template_arg_values=fn.inherited_template_arg_values,
+                        inherited_template_args=fn.inherited_template_args,
+                        callee_commit_dest_fn=call_loc.callee_commit_dest_fn,
+                        src=fn_proto.src,
+                        src_file=fn_proto.src_file,
+                        caller_line_index=line_index
+                    )
 
-                recall_fn_instance = compile_fn(fn_proto, recall_loc, args)
+                    recall_fn_instance = yield (fn_proto, recall_loc)
 
                 if current_comp_segment_depth == 1:
                     warn_print(fn_proto.src_file, f"recall most likely causes an infinite loop", line_index, fn_proto.src)
 
-                current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, recall_fn_instance.comp_name, '\n'))
-            elif acc.startswith("commit"):
+                current_comp_segment.append(f"{indent}{recall_fn_instance.comp_name}\n")
+            elif keyword == "commit":
                 if not fn_proto.is_slice_valid:
                     raise CompileError(f"cannot use the commit keyword inside a non-slice fn (see numka slice fn docs)", fn_proto.src_file, line_index, fn_proto.src)
 
-                if not call_loc.callee_commit_dest_fn is None:
+                if call_loc.callee_commit_dest_fn is not None:
                     acc = acc[6:].strip()
 
-                    if not acc == '':
+                    if acc != '':
                         raise CompileError(f"syntax error - expected a ';' after a commit keyword", fn_proto.src_file, line_index, fn_proto.src)
 
                     # commit by calling target fn
 
-                    current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, call_loc.callee_commit_dest_fn.comp_name, '\n'))
+                    current_comp_segment.append(f"{indent}{call_loc.callee_commit_dest_fn.comp_name}\n")
                 else:
                     warn_print(fn_proto.src_file, f"commit keyword used while not pushing a stack slice, called from fn \"{call_loc.caller_fn_name}\"", line_index, fn_proto.src)
 
@@ -788,10 +882,12 @@ def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argpar
                 if acc.startswith('push '):
                     acc = acc[5:]
 
-                    if '(' in acc and not ')' in acc:
+                    open_paren = acc.find('(')
+
+                    if open_paren != -1 and ')' not in acc:
                         raise CompileError("syntax error - unexpected \';\' inside a template args closure", fn_proto.src_file, line_index, fn_proto.src)
 
-                    tem_args, size_read = parse_template_args(fn_proto.src, fn_proto.src_file, line_index, acc, args)
+                    tem_args, size_read = parse_template_args(fn_proto.src, fn_proto.src_file, line_index, acc)
 
                     if size_read == 0:
                         if len(acc.split(' ', 1)) == 2:
@@ -799,15 +895,15 @@ def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argpar
                         
                         acc = acc.split(' ', 1)[0]
                     else:
-                        if not acc[size_read + 1:].strip() == '':
+                        if acc[size_read + 1:].strip() != '':
                             raise CompileError(f"syntax error - expected a \';\' after a push fn call", fn_proto.src_file, line_index, fn_proto.src)
 
-                        acc = acc.split('(', 1)[0].strip()
+                        acc = acc[:open_paren].strip()
 
                     if slice_name in slice_stack_scopes:
                         raise CompileError(f"stack slice name \"{acc}\" already in use", fn_proto.src_file, line_index, fn_proto.src)
 
-                    if not current_comp_segment_depth == 1:
+                    if current_comp_segment_depth != 1:
                         raise CompileError(f"for now, stack slices can be only used on the root scope (outside of if, while, for, etc.)", fn_proto.src_file, line_index, fn_proto.src)
 
                     # gen next segment comp_name and use it as commit dest fn
@@ -817,15 +913,15 @@ def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argpar
                     next_comp_segment_index += 1
                     current_comp_segment_index = next_comp_segment_index
 
-                    comp_name = gen_comp_name(fn_proto, call_loc, current_comp_segment_index)
+                    comp_name = gen_comp_name(fn_proto, call_loc, current_comp_segment_index, state)
 
                     commit_loc = CallableAst(
-                        name=fn_proto.name + f"[segment:{current_comp_segment_index}]",
+                        name=f"{fn_proto.name}[segment:{current_comp_segment_index}]",
                         comp_name=comp_name
                     )
 
                     # push fn callee
-                    callee_fn = defined_fn_prototypes.get(acc)
+                    callee_fn = get_fn_proto(acc)
 
                     if callee_fn is None:
                         raise CompileError(f"call to an undefined push fn \"{acc}\"", fn_proto.src_file, line_index, fn_proto.src)
@@ -835,7 +931,7 @@ def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argpar
 
                     push_loc = CallLocationAst(
                         caller_fn_name=fn_proto.name, 
-                        callee_fn_name=acc,
+                        callee_fn_name=callee_fn.name,
                         template_arg_values=tem_args,
                         callee_commit_dest_fn=commit_loc,
                         src=fn_proto.src,
@@ -843,25 +939,24 @@ def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argpar
                         caller_line_index=line_index
                     )
 
-                    push_fn = compile_fn(callee_fn, push_loc, args)
+                    push_fn = yield (callee_fn, push_loc)
 
-                    current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, push_fn.comp_name, '\n'))
-                    slice_stack_scopes.insert(0, slice_name)
+                    current_comp_segment.append(f"{indent}{push_fn.comp_name}\n")
+                    slice_stack_scopes.append(slice_name)
                     
-                    if slice_name in poped_stack_slices:
-                        poped_stack_slices.remove(slice_name)
+                    poped_stack_slices.discard(slice_name)
 
                     # split fn segments
                     
                     if len(fn.compiled_segments) > old_segment_index: # unfinished, will be continued after pop
-                        fn.compiled_segments[old_segment_index] = current_comp_segment
+                        fn.compiled_segments[old_segment_index] = ''.join(current_comp_segment)
                     else:
-                        fn.compiled_segments.append(current_comp_segment)
+                        fn.compiled_segments.append(''.join(current_comp_segment))
                     
-                    current_comp_segment = ""
-                    current_comp_segment = ''.join((comp_name, '\n'))
+                    current_comp_segment = [f"{comp_name}\n"]
 
                     current_comp_segment_depth = 1
+                    indent = '   '
 
                 else:
                     raise CompileError("syntax error - stack slice assignment must use the \'push\' keyword", fn_proto.src_file, line_index, fn_proto.src)
@@ -875,166 +970,206 @@ def compile_fn(fn_proto: FnPrototypeAst, call_loc: CallLocationAst, args: argpar
                 if acc in poped_stack_slices:
                     raise CompileError(f"stack slice \"{acc}\" already poped", fn_proto.src_file, line_index, fn_proto.src)
 
-                elif len(slice_stack_scopes) == 0 or not acc in slice_stack_scopes:
+                elif len(slice_stack_scopes) == 0 or acc not in slice_stack_scopes:
                     raise CompileError(f"unknown stack slice \"{acc}\"", fn_proto.src_file, line_index, fn_proto.src)
 
-                elif not slice_stack_scopes[0] == acc:
-                    raise CompileError(f"only the last pushed stack slice (here it's slice \"{slice_stack_scopes[0]}\") can be poped", fn_proto.src_file, line_index, fn_proto.src)
+                elif slice_stack_scopes[-1] != acc:
+                    raise CompileError(f"only the last pushed stack slice (here it's slice \"{slice_stack_scopes[-1]}\") can be poped", fn_proto.src_file, line_index, fn_proto.src)
 
-                if not current_comp_segment_depth == 1:
+                if current_comp_segment_depth != 1:
                         raise CompileError(f"for now, stack slices can be only used on the root scope (outside of if, while, for, etc.)", fn_proto.src_file, line_index, fn_proto.src)
 
-                slice_stack_scopes.pop(0)
-                poped_stack_slices.append(acc)
+                slice_stack_scopes.pop()
+                poped_stack_slices.add(acc)
 
                 # return to push parent fn segment
 
+                current_comp_segment.append(f"{kw_end}\n\n")
+
                 if len(fn.compiled_segments) > current_comp_segment_index:
-                    fn.compiled_segments[current_comp_segment_index] = ''.join((current_comp_segment, builtin_cg_keywords["end"], "\n\n"))
+                    fn.compiled_segments[current_comp_segment_index] = ''.join(current_comp_segment)
                 else:
-                    fn.compiled_segments.append(''.join((current_comp_segment, builtin_cg_keywords["end"], "\n\n")))
+                    fn.compiled_segments.append(''.join(current_comp_segment))
 
                 current_comp_segment_index = comp_segment_stack.pop()
-                comp_name = gen_comp_name(fn_proto, call_loc, current_comp_segment_index)
 
-                current_comp_segment = fn.compiled_segments[current_comp_segment_index]
+                # continue the unfinished parent segment (stored joined while the slice was alive)
+                current_comp_segment = [fn.compiled_segments[current_comp_segment_index]]
                 current_comp_segment_depth = 1
+                indent = '   '
 
-            elif acc.startswith("if") or acc.startswith("while") or acc.startswith("for"):
+            elif keyword in ("if", "while", "for"):
                 raise CompileError(f"syntax error - if, while, and for statements do not support bracket-less forms", fn_proto.src_file, line_index, fn_proto.src)
             else:
-                if '(' in acc and not ')' in acc:
+                open_paren = acc.find('(')
+
+                if open_paren != -1 and ')' not in acc:
                     raise CompileError("syntax error - unexpected \';\' inside a template args closure", fn_proto.src_file, line_index, fn_proto.src)
 
-                tem_args, size_read = parse_template_args(fn_proto.src, fn_proto.src_file, line_index, acc, args)
+                tem_args, size_read = parse_template_args(fn_proto.src, fn_proto.src_file, line_index, acc)
 
                 if size_read == 0:
-                    if len(acc.split(' ', 1)) == 2:
+                    # acc is stripped and whitespace collapsed, any space separates trailing garbage
+                    if ' ' in acc:
                         raise CompileError(f"syntax error - expected a \';\' after a fn call", fn_proto.src_file, line_index, fn_proto.src)
-                    
-                    acc = acc.split(' ', 1)[0]
                 else:
-                    if not acc[size_read + 1:].strip() == '':
+                    if acc[size_read + 1:].strip() != '':
                         raise CompileError(f"syntax error - expected a \';\' after a fn call", fn_proto.src_file, line_index, fn_proto.src)
 
-                    acc = acc.split('(', 1)[0].strip()
+                    acc = acc[:open_paren].strip()
 
                 # fn call
-                callee_fn = defined_fn_prototypes.get(acc)
+                callee_fn = get_fn_proto(acc)
 
                 if callee_fn is None:
                     raise CompileError(f"call to an undefined fn \"{acc}\"", fn_proto.src_file, line_index, fn_proto.src)
 
-                fn_call_loc = CallLocationAst(
-                    caller_fn_name=fn_proto.name,
-                    callee_fn_name=acc,
-                    template_arg_values=tem_args,
-                    callee_commit_dest_fn=call_loc.callee_commit_dest_fn if callee_fn.is_slice_valid else None, # can commit for the current fn push (if it's also a slicing fn)
-                    src=fn_proto.src,
-                    src_file=fn_proto.src_file,
-                    caller_line_index=line_index
-                )
+                callee_commit_dest_fn = call_loc.callee_commit_dest_fn if callee_fn.is_slice_valid else None # can commit for the current fn push (if it's also a slicing fn)
+
+                # skip building a call location for an already compiled instance
+                callee_fn_instance = get_fn_instance(fn_instance_key(callee_fn, tem_args, tuple(), callee_commit_dest_fn))
 
-                callee_fn_instance = compile_fn(callee_fn, fn_call_loc, args)
+                if callee_fn_instance is None:
+                    fn_call_loc = CallLocationAst(
+                        caller_fn_name=fn_proto.name,
+                        callee_fn_name=callee_fn.name,
+                        template_arg_values=tem_args,
+                        callee_commit_dest_fn=callee_commit_dest_fn,
+                        src=fn_proto.src,
+                        src_file=fn_proto.src_file,
+                        caller_line_index=line_index
+                    )
 
-                current_comp_segment = ''.join((current_comp_segment, '   ' * current_comp_segment_depth, callee_fn_instance.comp_name, "\n"))
+                    callee_fn_instance = yield (callee_fn, fn_call_loc)
+
+                current_comp_segment.append(f"{indent}{callee_fn_instance.comp_name}\n")
             
             acc = ""
-        else:
-            acc += c
 
         i += 1
     
-    if i == len(fn_src):
+    if i == fn_src_len:
         raise CompileError(f"unexpected end of file, fn \"{fn.name}\" never closed (did you forget a \'{'}'}\'?)", fn_proto.src_file, i - 1, fn_proto.src)
 
     # assemble owned compiled segments in output
 
-    global output_source
-
-    fn.compiled_segments.reverse()
-    for seg in fn.compiled_segments:
-        output_source = ''.join((output_source, seg.upper()))
+    state.output_source.write(''.join(reversed(fn.compiled_segments)).upper())
 
     return fn
 
-def compile_source_file(src_file: str, args: argparse.Namespace) -> None:
-    source_file_compiled[os.path.realpath(src_file)] = False
+def cached_realpath(path: str, state: CompilerState) -> str:
+    # the same import paths get resolved for every file importing them, resolve each only once per compilation
+    real_path = state.real_paths.get(path)
 
-    src_file = os.path.normpath(src_file)
-    status_print(src_file)
+    if real_path is None:
+        real_path = os.path.realpath(path)
+        state.real_paths[path] = real_path
 
-    # parse top-level source asts
-    f = open(src_file, 'r')
-    src = f.read().split('\n')
+    return real_path
 
-    i = 0
-    while i < len(src):
-        l = src[i].strip()
+def compile_source_file(src_file: str, state: CompilerState) -> None:
+    # files suspended by an import, resumed once the imported file is compiled
+    file_stack = []
+    next_src_file = src_file
+    next_real_src_file = cached_realpath(src_file, state)
 
-        # strip comments
-        l = l.split('//', 1)[0]
+    while True:
+        if next_src_file is not None:
+            real_src_file = next_real_src_file
+            state.source_file_compiled[real_src_file] = False
 
-        if l == "":
-            i += 1
-            continue
+            src_file = os.path.normpath(next_src_file)
+            next_src_file = None
+            status_print(src_file)
+
+            with open(src_file, 'rb') as f:
+                src = f.read().decode('utf-8').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+
+            i = 0
 
-        if l.startswith("import "):
-            l = l[7:]
+        # parse top-level source asts
+        src_len = len(src)
+        while i < src_len:
+            # strip comments
+            l = src[i].partition('//')[0].strip()
 
-            import_file = l.strip()
-            found = False
+            if l == "":
+                i += 1
+                continue
 
-            for path in import_paths:
-                path = path + "/" + import_file
+            keyword_match = top_level_keyword_re.match(l)
+            keyword = None if keyword_match is None else keyword_match.group(1)
 
-                if not os.path.exists(path):
-                    continue
+            if keyword == "import":
+                import_file = l[keyword_match.end():].strip()
+                found = False
 
-                if not os.path.realpath(path) in source_file_compiled:
-                    # compile a new source file into output and asts
-                    compile_source_file(path, args)
-                    found = True
+                for path in state.import_paths:
+                    path = f"{path}/{import_file}"
 
-                elif source_file_compiled[os.path.realpath(path)]:
-                    found = True
+                    if not os.path.exists(path):
+                        continue
 
-                else:
-                    raise CompileError(f"cyclical import of source file \"{import_file}\"", src_file, i, src)
+                    # first import path containing the file wins, later ones are not searched
+                    real_path = cached_realpath(path, state)
+                    compiled = state.source_file_compiled.get(real_path)
 
-            if not found:
-                raise CompileError(f"source file to be imported \"{import_file}\" not found", src_file, i, src)
+                    if compiled is None:
+                        # compile a new source file into output and asts before continuing this one
+                        next_src_file = path
+                        next_real_src_file = real_path
 
-            # reset status after import
-            status_print(src_file)
+                    elif not compiled:
+                        raise CompileError(f"cyclical import of source file \"{import_file}\"", src_file, i, src)
 
-        elif l.startswith("fn "):
-            l = l[3:].lstrip()
+                    found = True
+                    break
 
-            fn = parse_fn(src, src_file, i, None, args)
+                if not found:
+                    raise CompileError(f"source file to be imported \"{import_file}\" not found", src_file, i, src)
 
-            if fn.top_level_implicit_usage:
-                call_loc = CallLocationAst(
-                    caller_fn_name="(top-level)",
-                    callee_fn_name=fn.name,
-                    template_arg_values=tuple(),
-                    callee_commit_dest_fn=None,
-                    src=src,
-                    src_file=src_file,
-                    caller_line_index=fn.line_of_definition
-                )
+                if next_src_file is not None:
+                    file_stack.append((src_file, real_src_file, src, i + 1))
+                    break
+
+                # reset status after import
+                status_print(src_file)
+
+            elif keyword == "fn":
+                fn = parse_fn(src, src_file, i, None, state)
+
+                if fn.top_level_implicit_usage:
+                    call_loc = CallLocationAst(
+                        caller_fn_name="(top-level)",
+                        callee_fn_name=fn.name,
+                        template_arg_values=tuple(),
+                        callee_commit_dest_fn=None,
+                        src=src,
+                        src_file=src_file,
+                        caller_line_index=fn.line_of_definition
+                    )
+
+                    compile_fn(fn, call_loc, state)
+
+                # continue after the fn body
+                i = fn.ending_line_of_definition
 
-                compile_fn(fn, call_loc, args)
+            else:
+                raise CompileError("syntax error - expression outside of a fn", src_file, i, src)
 
-            i += fn.ending_line_of_definition - fn.line_of_definition
+            i += 1
 
         else:
-            raise CompileError("syntax error - expression outside of a fn", src_file, i, src)
+            state.source_file_compiled[real_src_file] = True
 
-        i += 1
-    
-    f.close()
-    source_file_compiled[os.path.realpath(src_file)] = True
+            if len(file_stack) == 0:
+                return
+
+            # resume the importing file
+            src_file, real_src_file, src, i = file_stack.pop()
+
+            # reset status after import
+            status_print(src_file)
 
 
 # == argument parser ==
@@ -1072,38 +1207,48 @@ if __name__ == '__main__':
     elif args.W == 'none':
         warning_level = 0
 
-    builtin_fns = builtin_dialects[args.lkarel_lang_dialect][0]
-    builtit_reserved = builtin_dialects[args.lkarel_lang_dialect][1]
-    builtin_cg_keywords = builtin_dialects[args.lkarel_lang_dialect][2]
-
     import_paths = ["."]
     for path in args.I:
         import_paths.append(path)
 
+    # compiled fns are streamed into a partial file that replaces the output only once compilation succeeds
+    partial_output_file = f"{args.o}.partial"
+
+    state = CompilerState(args=args, import_paths=import_paths, output_source=open(partial_output_file, 'w', encoding='utf-8'))
+
     # start compilation
 
     try:
         for src_file in args.source_files:
-            if src_file in source_file_compiled:
+            # skip source files already compiled through an import
+            if cached_realpath(src_file, state) in state.source_file_compiled:
                 continue
 
-            compile_source_file(src_file, args)
+            compile_source_file(src_file, state)
         
         if args.vv:
-            print(defined_fn_prototypes, '\n')
-            print(instaciated_fns, '\n')
-
-        o = open(args.o, 'w')
-        o.write(output_source)
-        o.close()
+            print(state.defined_fn_prototypes, '\n')
+            print(state.instaciated_fns, '\n')
 
-        print(f"\x1b[1K\rCompiled {bold_escape}{len(source_file_compiled)}{reset_escape} source files into {bold_escape}{args.o}{reset_escape} successfully!")
+        state.output_source.close()
+        os.replace(partial_output_file, args.o)
 
     except CompileError as e:
         if args.vv:
-            print(defined_fn_prototypes, '\n')
-            print(instaciated_fns, '\n')
+            print(state.defined_fn_prototypes, '\n')
+            print(state.instaciated_fns, '\n')
+
+        state.output_source.close()
+        os.remove(partial_output_file)
 
         error_print(e.src_file, e.message, e.line_index, e.src)
         print(f"Compilation {error_escape}failed{reset_escape} in source file {bold_escape}{e.src_file}{reset_escape}!")
-        exit(-1)
\ No newline at end of file
+        exit(-1)
+
+    except BaseException:
+        # unreadable source files, internal errors and interrupts must not leave a partial output behind either
+        state.output_source.close()
+        os.remove(partial_output_file)
+        raise
+
+    print(f"\x1b[1K\rCompiled {bold_escape}{len(state.source_file_compiled)}{reset_escape} source files into {bold_escape}{args.o}{reset_escape} successfully!")
@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+numka_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "numka.py")
+
+def run_numka(cwd: str, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, numka_path, *args], cwd=cwd, capture_output=True, text=True)
+
+class PartialOutputTest(unittest.TestCase):
+    def test_missing_source_file_leaves_no_partial_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            result = run_numka(tmp, "-o", "out.kl", "missing.nka")
+
+            self.assertNotEqual(result.returncode, 0)
+            self.assertFalse(os.path.exists(os.path.join(tmp, "out.kl.partial")))
+            self.assertFalse(os.path.exists(os.path.join(tmp, "out.kl")))
+
+    def test_compile_error_leaves_no_partial_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "bad.nka"), 'w') as f:
+                f.write("fn a {\n    undefined_fn;\n}\n")
+
+            result = run_numka(tmp, "-o", "out.kl", "bad.nka")
+
+            self.assertNotEqual(result.returncode, 0)
+            self.assertFalse(os.path.exists(os.path.join(tmp, "out.kl.partial")))
+            self.assertFalse(os.path.exists(os.path.join(tmp, "out.kl")))
+
+    def test_success_replaces_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "ok.nka"), 'w') as f:
+                f.write("fn a {\n    step;\n}\n")
+
+            result = run_numka(tmp, "-o", "out.kl", "ok.nka")
+
+            self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+            self.assertFalse(os.path.exists(os.path.join(tmp, "out.kl.partial")))
+            self.assertTrue(os.path.exists(os.path.join(tmp, "out.kl")))
+
+class SourceReadTest(unittest.TestCase):
+    def test_lone_cr_line_endings_split_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "cr.nka"), 'wb') as f:
+                f.write(b"fn a {\r    undefined_fn;\r}\r")
+
+            result = run_numka(tmp, "-o", "out.kl", "cr.nka")
+
+            self.assertNotEqual(result.returncode, 0)
+            self.assertIn("call to an undefined fn \"undefined_fn\"", result.stdout)
+            self.assertIn("\"cr.nka\":2", result.stdout)
+
+class CompilerStateTest(unittest.TestCase):
+    def compile_in_process(self, tmp: str, dialect: str) -> str:
+        import argparse
+        import numka
+
+        args = argparse.Namespace(g=False, vv=False, max_loop_count=65535, lkarel_lang_dialect=dialect)
+        state = numka.CompilerState(args=args, import_paths=[tmp])
+
+        src_file = os.path.join(tmp, "ok.nka")
+        with open(src_file, 'w') as f:
+            f.write("fn a {\n    step;\n    ++;\n    if is_wall {\n        left;\n    }\n}\n")
+
+        numka.compile_source_file(src_file, state)
+        return state.output_source.getvalue()
+
+    def test_dialect_tables_come_from_state(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertIn("KROK", self.compile_in_process(tmp, "VisK99"))
+
+            output = self.compile_in_process(tmp, "PyKarel/Kvm")
+            self.assertIn("STEP", output)
+            self.assertIn("PLACE", output)
+            self.assertIn("IF IS WALL", output)
+
+class ForCountTest(unittest.TestCase):
+    def compile_for(self, tmp: str, count: str) -> subprocess.CompletedProcess:
+        with open(os.path.join(tmp, "for.nka"), 'w') as f:
+            f.write(f"fn a {{\n    for {count} {{\n        step;\n    }}\n}}\n")
+
+        return run_numka(tmp, "-o", "out.kl", "for.nka")
+
+    def test_prefixed_counts(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for count, value in (("0x10", 16), ("0o17", 15), ("0b101", 5), ("12", 12)):
+                result = self.compile_for(tmp, count)
+
+                self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+                with open(os.path.join(tmp, "out.kl"), encoding='utf-8') as f:
+                    self.assertIn(f"REPEAT {value}-TIMES", f.read())
+
+    def test_trailing_text_is_not_convertible(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            result = self.compile_for(tmp, "5 x")
+
+            self.assertNotEqual(result.returncode, 0)
+            self.assertIn("for loop count \"5 x\" is not convertible to an integer", result.stdout)
+
+if __name__ == '__main__':
+    unittest.main()